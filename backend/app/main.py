@@ -1,9 +1,18 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    _default_response_class = ORJSONResponse
+except ImportError:
+    _default_response_class = JSONResponse
 import socketio
 import uvicorn
+import aiofiles
 import os
+import re
 import uuid
 import asyncio
 from datetime import datetime
@@ -15,8 +24,13 @@ from app.models.schemas import (
     QueryRequest, QueryResponse, VideoAnalysisResult
 )
 from app.services.simple_processor import SimpleVideoProcessor
+from app.services.job_store import JobStore
 
-app = FastAPI(title=settings.app_name, version=settings.app_version)
+app = FastAPI(
+    title=settings.app_name,
+    version=settings.app_version,
+    default_response_class=_default_response_class
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,8 +47,68 @@ sio = socketio.AsyncServer(
 
 socket_app = socketio.ASGIApp(sio, app)
 
+class ThrottledEmitter:
+    def __init__(self, server: socketio.AsyncServer, min_interval: float = 0.1):
+        self._server = server
+        self._min_interval = min_interval
+        self._last_emit: Dict[str, float] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+
+    async def emit(self, event: str, payload: Dict[str, Any], room: str, force: bool = False):
+        now = asyncio.get_event_loop().time()
+        last = self._last_emit.get(room)
+
+        if force or last is None or now - last >= self._min_interval:
+            self._pending.pop(room, None)
+            self._last_emit[room] = now
+            await self._server.emit(event, payload, room=room)
+            return
+
+        self._pending[room] = payload
+        task = self._flush_tasks.get(room)
+        if task is None or task.done():
+            self._flush_tasks[room] = asyncio.create_task(self._flush_later(event, room))
+
+    async def _flush_later(self, event: str, room: str):
+        await asyncio.sleep(self._min_interval)
+        payload = self._pending.pop(room, None)
+        if payload is not None:
+            self._last_emit[room] = asyncio.get_event_loop().time()
+            await self._server.emit(event, payload, room=room)
+
+    def cancel_pending(self, room: str):
+        task = self._flush_tasks.pop(room, None)
+        if task is not None and not task.done():
+            task.cancel()
+        self._pending.pop(room, None)
+        self._last_emit.pop(room, None)
+
+progress_emitter = ThrottledEmitter(sio)
+
+_INTENT_KEYWORDS = {
+    "people": "people",
+    "person": "people",
+    "count": "count",
+    "how many": "count",
+    "male": "gender",
+    "female": "gender",
+    "movement": "movement",
+    "moving": "movement",
+    "peak": "peak",
+    "most active": "peak",
+    "door": "zone",
+    "zone": "zone",
+}
+_INTENT_PATTERN = re.compile(
+    "|".join(re.escape(keyword) for keyword in sorted(_INTENT_KEYWORDS, key=len, reverse=True))
+)
+
+def match_query_intents(query: str) -> set:
+    return {_INTENT_KEYWORDS[match] for match in _INTENT_PATTERN.findall(query)}
+
 video_processor = SimpleVideoProcessor(settings.output_dir)
-jobs: Dict[str, Dict[str, Any]] = {}
+job_store = JobStore(settings.database_url.replace("sqlite:///", "", 1))
 
 @app.on_event("startup")
 async def startup_event():
@@ -42,23 +116,20 @@ async def startup_event():
     os.makedirs(settings.output_dir, exist_ok=True)
     await video_processor.initialize()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await video_processor.shutdown()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
 
 @app.get("/jobs")
 async def list_all_jobs():
+    job_list = job_store.list_jobs()
     return {
-        "total_jobs": len(jobs),
-        "jobs": [
-            {
-                "job_id": job_id,
-                "status": job_data["status"],
-                "filename": job_data["filename"],
-                "created_at": job_data["created_at"]
-            }
-            for job_id, job_data in jobs.items()
-        ]
+        "total_jobs": len(job_list),
+        "jobs": job_list
     }
 
 @app.post("/upload", response_model=VideoUploadResponse)
@@ -74,34 +145,37 @@ async def upload_video(video: UploadFile = File(...)):
     file_path = os.path.join(settings.upload_dir, filename)
     
     try:
-        with open(file_path, "wb") as buffer:
-            content = await video.read()
-            buffer.write(content)
-        
-        jobs[job_id] = {
-            "status": ProcessingStatus.UPLOADED,
-            "progress": 0,
-            "filename": video.filename,
-            "file_path": file_path,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
-        }
-        
+        bytes_written = 0
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await video.read(1024 * 1024):
+                bytes_written += len(chunk)
+                if bytes_written > settings.max_file_size:
+                    raise HTTPException(status_code=400, detail="File too large")
+                await buffer.write(chunk)
+
+        job_store.create(job_id, video.filename, file_path)
+
         return VideoUploadResponse(
             job_id=job_id,
             message="Video uploaded successfully",
             filename=video.filename
         )
-    
+
+    except HTTPException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
     except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @app.get("/status/{job_id}", response_model=JobStatus)
 async def get_job_status(job_id: str):
-    if job_id not in jobs:
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = jobs[job_id]
+
     return JobStatus(
         job_id=job_id,
         status=job["status"],
@@ -114,23 +188,22 @@ async def get_job_status(job_id: str):
 
 @app.post("/process/{job_id}")
 async def start_processing(job_id: str, background_tasks: BackgroundTasks):
-    if job_id not in jobs:
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = jobs[job_id]
+
     if job["status"] != ProcessingStatus.UPLOADED:
         raise HTTPException(status_code=400, detail="Job not ready for processing")
-    
+
     background_tasks.add_task(process_video_background, job_id)
-    
-    jobs[job_id]["status"] = ProcessingStatus.PROCESSING
-    jobs[job_id]["updated_at"] = datetime.now()
-    
+
+    job_store.update(job_id, status=ProcessingStatus.PROCESSING)
+
     return {"message": "Processing started"}
 
 async def process_video_background(job_id: str):
     try:
-        job = jobs[job_id]
+        job = job_store.get(job_id)
         video_path = job["file_path"]
         
         print(f"🎬 Starting processing for job {job_id}")
@@ -140,38 +213,28 @@ async def process_video_background(job_id: str):
         metadata = await video_processor.get_video_metadata(video_path)
         print(f"📊 Video metadata: {metadata.duration}s, {metadata.width}x{metadata.height}")
         
-        await update_job_progress(job_id, 20, "Extracting frames...")
-        frame_paths = await video_processor.extract_frames(video_path, job_id)
-        print(f"🖼️ Extracted {len(frame_paths)} frames")
-        
-        await update_job_progress(job_id, 40, "Detecting objects...")
-        detections = await video_processor.detect_objects_in_frames(frame_paths, job_id)
+        await update_job_progress(job_id, 20, "Extracting frames and detecting objects...")
+        total_frames, detections = await video_processor.extract_and_detect(video_path, job_id, metadata=metadata)
+        print(f"🖼️ Processed {total_frames} frames")
         print(f"👁️ Detected {len(detections)} objects")
         
-        await update_job_progress(job_id, 60, "Analyzing movements...")
-        movements = await video_processor.extract_movements(detections)
-        
-        await update_job_progress(job_id, 70, "Processing zones...")
+        await update_job_progress(job_id, 60, "Analyzing detections...")
         zones = await video_processor.define_zones(metadata.width, metadata.height)
-        zone_interactions = await video_processor.extract_zone_interactions(detections, zones)
-        
-        await update_job_progress(job_id, 80, "Extracting attributes...")
-        attributes = await video_processor.extract_person_attributes(detections)
-        
-        await update_job_progress(job_id, 90, "Creating temporal analysis...")
-        temporal_data = await video_processor.extract_temporal_data(detections, movements)
+        movements, zone_interactions, attributes, temporal_data = await video_processor.analyze_detections(detections, zones)
+
+        await update_job_progress(job_id, 90, "Building results...")
         
         people_count = len(set(d.object_id for d in detections if d.object_type == "person"))
         peak_activity = max(temporal_data, key=lambda x: x.total_objects) if temporal_data else None
         
         result = {
             "job_id": job_id,
-            "total_frames": len(frame_paths),
+            "total_frames": total_frames,
             "objects_detected": len(detections),
             "movements_tracked": len(movements),
             "zone_interactions": len(zone_interactions),
             "attribute_data": len(attributes),
-            "video_metadata": metadata.dict(),
+            "video_metadata": metadata.model_dump(mode="python"),
             "summary": {
                 "unique_people": people_count,
                 "total_objects": len(detections),
@@ -180,36 +243,39 @@ async def process_video_background(job_id: str):
                     "object_count": peak_activity.total_objects if peak_activity else 0
                 }
             },
-            "detections": [d.dict() for d in detections],
-            "movements": [m.dict() for m in movements],
-            "zone_interactions": [z.dict() for z in zone_interactions],
-            "attributes": [a.dict() for a in attributes],
-            "temporal_data": [t.dict() for t in temporal_data]
+            "detections": [d.model_dump(mode="python") for d in detections],
+            "movements": [m.model_dump(mode="python") for m in movements],
+            "zone_interactions": [z.model_dump(mode="python") for z in zone_interactions],
+            "attributes": [a.model_dump(mode="python") for a in attributes],
+            "temporal_data": [t.model_dump(mode="python") for t in temporal_data]
         }
         
-        jobs[job_id]["result"] = result
-        jobs[job_id]["status"] = ProcessingStatus.COMPLETED
-        jobs[job_id]["progress"] = 100
-        jobs[job_id]["message"] = "Processing completed successfully"
-        jobs[job_id]["updated_at"] = datetime.now()
-        
+        await asyncio.to_thread(
+            job_store.update,
+            job_id,
+            result=result,
+            status=ProcessingStatus.COMPLETED,
+            progress=100,
+            message="Processing completed successfully"
+        )
+
+        progress_emitter.cancel_pending(job_id)
         await sio.emit("processing_complete", result, room=job_id)
         await video_processor.cleanup_temp_files(job_id)
-        
+
     except Exception as e:
-        jobs[job_id]["status"] = ProcessingStatus.FAILED
-        jobs[job_id]["error"] = str(e)
-        jobs[job_id]["updated_at"] = datetime.now()
-        
+        job_store.update(job_id, status=ProcessingStatus.FAILED, error=str(e))
+
+        progress_emitter.cancel_pending(job_id)
         await sio.emit("processing_error", {"message": str(e)}, room=job_id)
 
 async def update_job_progress(job_id: str, progress: int, message: str = None):
-    jobs[job_id]["progress"] = progress
-    jobs[job_id]["updated_at"] = datetime.now()
     if message:
-        jobs[job_id]["message"] = message
-    
-    await sio.emit("processing_update", {
+        job_store.update(job_id, progress=progress, message=message)
+    else:
+        job_store.update(job_id, progress=progress)
+
+    await progress_emitter.emit("processing_update", {
         "job_id": job_id,
         "status": "processing",
         "progress": progress,
@@ -219,40 +285,47 @@ async def update_job_progress(job_id: str, progress: int, message: str = None):
 
 @app.get("/results/{job_id}", response_model=VideoAnalysisResult)
 async def get_analysis_results(job_id: str):
-    if job_id not in jobs:
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = jobs[job_id]
+
     if job["status"] != ProcessingStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Job not completed")
-    
-    result = job["result"]
+
+    result = await asyncio.to_thread(job_store.get_result, job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Results not found")
+
     return VideoAnalysisResult(**result)
 
 @app.post("/query/{job_id}", response_model=QueryResponse)
 async def query_video(job_id: str, request: QueryRequest):
-    if job_id not in jobs:
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    job = jobs[job_id]
+
     if job["status"] != ProcessingStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Job not completed")
-    
-    result = job["result"]
+
+    result = await asyncio.to_thread(job_store.get_result, job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Results not found")
+
     query = request.query.lower()
-    
+    intents = match_query_intents(query)
+
     response_text = "I couldn't find specific information about that query."
     confidence = 0.0
     sources = []
-    
-    if "people" in query or "person" in query:
+
+    if "people" in intents:
         unique_people = result["summary"]["unique_people"]
         total_detections = len([d for d in result["detections"] if d["object_type"] == "person"])
-        
-        if "count" in query or "how many" in query:
+
+        if "count" in intents:
             response_text = f"I detected {unique_people} unique people in the video. There were {total_detections} total person detections across all frames."
             confidence = 85.0
-        elif "male" in query or "female" in query:
+        elif "gender" in intents:
             gender_data = {}
             for attr in result["attributes"]:
                 if attr["estimated_gender"]:
@@ -262,7 +335,7 @@ async def query_video(job_id: str, request: QueryRequest):
             response_text = f"Based on visual analysis: {gender_data}"
             confidence = 60.0
     
-    elif "movement" in query or "moving" in query:
+    elif "movement" in intents:
         movements = result["movements"]
         total_movements = len(movements)
         
@@ -274,12 +347,12 @@ async def query_video(job_id: str, request: QueryRequest):
         response_text = f"I tracked {total_movements} movements. Direction breakdown: {directions}"
         confidence = 80.0
     
-    elif "peak" in query or "most active" in query:
+    elif "peak" in intents:
         peak = result["summary"]["peak_activity"]
         response_text = f"Peak activity occurred at {peak['timestamp']}s with {peak['object_count']} objects detected."
         confidence = 90.0
     
-    elif "door" in query or "zone" in query:
+    elif "zone" in intents:
         door_interactions = [zi for zi in result["zone_interactions"] if zi["zone_name"] == "door_area"]
         response_text = f"There were {len(door_interactions)} interactions in the door area."
         confidence = 75.0
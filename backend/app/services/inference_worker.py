@@ -0,0 +1,99 @@
+import multiprocessing as mp
+import queue
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+def _infer_worker_main(model_path: str, in_q: mp.Queue, out_q: mp.Queue) -> None:
+    try:
+        import tensorflow as tf
+        model = tf.saved_model.load(model_path)
+    except Exception as e:
+        out_q.put(("error", f"Could not load TensorFlow model: {e}"))
+        return
+
+    out_q.put(("ready", None))
+
+    while True:
+        batch = in_q.get()
+        if batch is None:
+            break
+
+        try:
+            outputs = model(tf.constant(batch, dtype=tf.uint8))
+            out_q.put(("ok", {
+                "detection_boxes": outputs["detection_boxes"].numpy(),
+                "detection_scores": outputs["detection_scores"].numpy(),
+                "detection_classes": outputs["detection_classes"].numpy(),
+                "num_detections": outputs["num_detections"].numpy()
+            }))
+        except Exception as e:
+            out_q.put(("error", str(e)))
+
+class InferenceWorker:
+    def __init__(self, model_path: str):
+        self._model_path = model_path
+        self._in_q: mp.Queue = mp.Queue()
+        self._out_q: mp.Queue = mp.Queue()
+        self._process: Optional[mp.Process] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> bool:
+        self._process = mp.Process(
+            target=_infer_worker_main,
+            args=(self._model_path, self._in_q, self._out_q),
+            daemon=True
+        )
+        self._process.start()
+
+        while True:
+            try:
+                status, payload = self._out_q.get(timeout=1)
+                break
+            except queue.Empty:
+                if not self._process.is_alive():
+                    print("Warning: inference worker exited during startup")
+                    self._process = None
+                    return False
+
+        if status == "error":
+            print(f"Warning: {payload}")
+            self._process.join()
+            self._process = None
+            return False
+
+        return True
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def infer(self, batch: np.ndarray) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if not self.running:
+                raise RuntimeError("Inference worker is not running")
+
+            self._in_q.put(batch)
+            while True:
+                try:
+                    status, payload = self._out_q.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if not self._process.is_alive():
+                        self._process = None
+                        raise RuntimeError("Inference worker died while processing a batch")
+
+        if status == "error":
+            raise RuntimeError(f"Inference worker failed: {payload}")
+
+        return payload
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+
+        if self._process.is_alive():
+            self._in_q.put(None)
+        self._process.join()
+        self._process = None
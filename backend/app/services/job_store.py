@@ -0,0 +1,95 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.models.schemas import ProcessingStatus
+
+class JobStore:
+    def __init__(self, db_path: str = "./video_analysis.db"):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                filename TEXT,
+                file_path TEXT,
+                message TEXT,
+                error TEXT,
+                result TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def create(self, job_id: str, filename: str, file_path: str) -> None:
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, progress, filename, file_path, created_at, updated_at) "
+                "VALUES (?, ?, 0, ?, ?, ?, ?)",
+                (job_id, ProcessingStatus.UPLOADED.value, filename, file_path, now, now)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, status, progress, filename, file_path, message, error, "
+                "created_at, updated_at FROM jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        job = dict(row)
+        job["created_at"] = datetime.fromisoformat(job["created_at"])
+        job["updated_at"] = datetime.fromisoformat(job["updated_at"])
+        return job
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+
+        if row is None or not row["result"]:
+            return None
+
+        return json.loads(row["result"])
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if fields.get("result") is not None:
+            fields["result"] = json.dumps(fields["result"], default=str)
+        if "status" in fields:
+            fields["status"] = ProcessingStatus(fields["status"]).value
+        fields["updated_at"] = datetime.now().isoformat()
+
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {columns} WHERE job_id = ?",
+                (*fields.values(), job_id)
+            )
+            self._conn.commit()
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, status, filename, created_at FROM jobs ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) AS n FROM jobs").fetchone()
+        return row["n"]
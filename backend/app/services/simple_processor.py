@@ -1,8 +1,12 @@
+import functools
 import os
+import shutil
+import subprocess
 import cv2
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 import asyncio
+import concurrent.futures
 import aiofiles
 from pathlib import Path
 import json
@@ -14,30 +18,129 @@ from app.models.schemas import (
     PersonAttribute, TemporalData, ProcessingUpdate
 )
 
+_DIRECTIONS = ("right", "down", "left", "up")
+
+_ZONE_NAMES = ("top", "middle", "bottom", "left", "center", "right", "door_area")
+
+@functools.lru_cache(maxsize=8)
+def _zone_array(width: int, height: int) -> np.ndarray:
+    return np.array([
+        [0, 0, width, height * 0.3],
+        [0, height * 0.3, width, height * 0.4],
+        [0, height * 0.7, width, height * 0.3],
+        [0, 0, width * 0.3, height],
+        [width * 0.3, 0, width * 0.4, height],
+        [width * 0.7, 0, width * 0.3, height],
+        [width * 0.4, height * 0.1, width * 0.2, height * 0.8]
+    ], dtype=np.float32)
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbo_jpeg = TurboJPEG()
+except Exception:
+    _turbo_jpeg = None
+
+def _write_jpeg(frame: np.ndarray, frame_path: str, quality: int = 85) -> None:
+    if _turbo_jpeg is not None:
+        with open(frame_path, "wb") as f:
+            f.write(_turbo_jpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR))
+    else:
+        cv2.imwrite(frame_path, frame)
+
+_cpu_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+def _get_cpu_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max(1, (os.cpu_count() or 2) // 2)
+        )
+    return _cpu_pool
+
 class SimpleVideoProcessor:
     def __init__(self, output_dir: str = "./output"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
-        
+        self._meta_cache: Dict[str, VideoMetadata] = {}
+
     async def initialize(self):
         print("Simple video processor initialized")
 
+    async def shutdown(self):
+        global _cpu_pool
+        if _cpu_pool is not None:
+            _cpu_pool.shutdown(wait=False)
+            _cpu_pool = None
+
     async def get_video_metadata(self, video_path: str) -> VideoMetadata:
+        cached = self._meta_cache.get(video_path)
+        if cached is not None:
+            return cached
+
+        metadata = None
+        if shutil.which("ffprobe"):
+            metadata = await asyncio.to_thread(self._ffprobe_metadata, video_path)
+        if metadata is None:
+            metadata = await asyncio.to_thread(self._get_metadata_sync, video_path)
+
+        self._meta_cache[video_path] = metadata
+        return metadata
+
+    @staticmethod
+    def _ffprobe_metadata(video_path: str) -> Optional[VideoMetadata]:
+        try:
+            proc = subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "stream=width,height,r_frame_rate,nb_frames,duration,codec_name",
+                 "-show_entries", "format=duration",
+                 "-of", "json", video_path],
+                capture_output=True, timeout=30
+            )
+            if proc.returncode != 0:
+                return None
+
+            probe = json.loads(proc.stdout)
+            stream = probe["streams"][0]
+            num, _, den = stream["r_frame_rate"].partition("/")
+            fps = float(num) / float(den) if den and float(den) > 0 else float(num)
+
+            if "duration" in stream:
+                duration = float(stream["duration"])
+            elif "duration" in probe.get("format", {}):
+                duration = float(probe["format"]["duration"])
+            elif "nb_frames" in stream and fps > 0:
+                duration = int(stream["nb_frames"]) / fps
+            else:
+                return None
+
+            return VideoMetadata(
+                duration=duration,
+                width=int(stream["width"]),
+                height=int(stream["height"]),
+                frame_rate=fps,
+                size=os.path.getsize(video_path),
+                codec=stream.get("codec_name")
+            )
+        except (OSError, subprocess.TimeoutExpired, ValueError, KeyError, IndexError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _get_metadata_sync(video_path: str) -> VideoMetadata:
         cap = cv2.VideoCapture(video_path)
-        
+
         if not cap.isOpened():
             raise ValueError("Could not open video file")
-        
+
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         fps = cap.get(cv2.CAP_PROP_FPS)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         duration = frame_count / fps if fps > 0 else 0
-        
+
         cap.release()
-        
+
         file_size = os.path.getsize(video_path)
-        
+
         return VideoMetadata(
             duration=duration,
             width=width,
@@ -46,12 +149,22 @@ class SimpleVideoProcessor:
             size=file_size
         )
 
-    async def extract_frames(self, video_path: str, job_id: str, frame_rate: float = 0.5) -> List[str]:
-        cap = cv2.VideoCapture(video_path)
+    async def extract_frames(self, video_path: str, job_id: str, frame_rate: float = 0.5, metadata: Optional[VideoMetadata] = None) -> List[str]:
         frames_dir = self.output_dir / job_id / "frames"
         frames_dir.mkdir(parents=True, exist_ok=True)
-        
-        fps = cap.get(cv2.CAP_PROP_FPS)
+
+        fps = metadata.frame_rate if metadata is not None else None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _get_cpu_pool(), self._extract_frames_sync, video_path, frames_dir, frame_rate, fps
+        )
+
+    @staticmethod
+    def _extract_frames_sync(video_path: str, frames_dir: Path, frame_rate: float, fps: Optional[float] = None) -> List[str]:
+        cap = cv2.VideoCapture(video_path)
+
+        if fps is None:
+            fps = cap.get(cv2.CAP_PROP_FPS)
         frame_interval = int(fps / frame_rate) if fps > 0 else 30
         
         frame_paths = []
@@ -59,18 +172,21 @@ class SimpleVideoProcessor:
         saved_count = 0
         
         while True:
-            ret, frame = cap.read()
-            if not ret:
+            if not cap.grab():
                 break
-                
+
             if frame_count % frame_interval == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+
                 frame_filename = f"frame_{saved_count:04d}.jpg"
                 frame_path = frames_dir / frame_filename
-                
-                cv2.imwrite(str(frame_path), frame)
+
+                _write_jpeg(frame, str(frame_path))
                 frame_paths.append(str(frame_path))
                 saved_count += 1
-            
+
             frame_count += 1
         
         cap.release()
@@ -125,172 +241,291 @@ class SimpleVideoProcessor:
         
         return mock_detections
 
+    def _build_detection(self, job_id: str, frame_idx: int, det_idx: int, pred: Dict) -> ObjectDetection:
+        return ObjectDetection(
+            object_id=f"{job_id}_{frame_idx}_{det_idx}",
+            object_type=pred["class"],
+            confidence=pred["score"],
+            bbox={
+                "x": pred["bbox"][0],
+                "y": pred["bbox"][1],
+                "width": pred["bbox"][2],
+                "height": pred["bbox"][3]
+            },
+            frame_number=frame_idx + 1,
+            timestamp=frame_idx * 2.0,
+            size=pred["bbox"][2] * pred["bbox"][3],
+            aspect_ratio=pred["bbox"][2] / pred["bbox"][3] if pred["bbox"][3] > 0 else 1.0
+        )
+
+    async def extract_and_detect(self, video_path: str, job_id: str, frame_rate: float = 0.5, prefetch: int = 8, metadata: Optional[VideoMetadata] = None) -> Tuple[int, List[ObjectDetection]]:
+        read_q: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+        detections: List[ObjectDetection] = []
+        sampled_count = 0
+
+        async def reader():
+            nonlocal sampled_count
+            cap = await asyncio.to_thread(cv2.VideoCapture, video_path)
+            try:
+                fps = metadata.frame_rate if metadata is not None else cap.get(cv2.CAP_PROP_FPS)
+                frame_interval = int(fps / frame_rate) if fps > 0 else 30
+                frame_count = 0
+
+                while await asyncio.to_thread(cap.grab):
+                    if frame_count % frame_interval == 0:
+                        ret, frame = await asyncio.to_thread(cap.retrieve)
+                        if not ret:
+                            break
+                        await read_q.put((sampled_count, frame))
+                        sampled_count += 1
+                    frame_count += 1
+            finally:
+                cap.release()
+            await read_q.put(None)
+
+        async def detector():
+            while True:
+                item = await read_q.get()
+                if item is None:
+                    break
+
+                frame_idx, frame = item
+                predictions = await asyncio.to_thread(self.detect_objects_simple, frame, frame_idx + 1)
+
+                for j, pred in enumerate(predictions):
+                    if pred["score"] > 0.5:
+                        detections.append(self._build_detection(job_id, frame_idx, j, pred))
+
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(reader())
+            tg.create_task(detector())
+
+        return sampled_count, detections
+
     async def detect_objects_in_frames(self, frame_paths: List[str], job_id: str) -> List[ObjectDetection]:
+        return await asyncio.to_thread(self._detect_objects_in_frames_sync, frame_paths, job_id)
+
+    def _detect_objects_in_frames_sync(self, frame_paths: List[str], job_id: str) -> List[ObjectDetection]:
         detections = []
-        
+
         for i, frame_path in enumerate(frame_paths):
             image = cv2.imread(frame_path)
-            timestamp = i * 2.0
-            
+
             predictions = self.detect_objects_simple(image, i + 1)
-            
+
             for j, pred in enumerate(predictions):
                 if pred["score"] > 0.5:
-                    detection = ObjectDetection(
-                        object_id=f"{job_id}_{i}_{j}",
-                        object_type=pred["class"],
-                        confidence=pred["score"],
-                        bbox={
-                            "x": pred["bbox"][0],
-                            "y": pred["bbox"][1],
-                            "width": pred["bbox"][2],
-                            "height": pred["bbox"][3]
-                        },
-                        frame_number=i + 1,
-                        timestamp=timestamp,
-                        size=pred["bbox"][2] * pred["bbox"][3],
-                        aspect_ratio=pred["bbox"][2] / pred["bbox"][3] if pred["bbox"][3] > 0 else 1.0
-                    )
-                    detections.append(detection)
-        
+                    detections.append(self._build_detection(job_id, i, j, pred))
+
         return detections
 
+    @staticmethod
+    def _detection_soa(detections: List[ObjectDetection]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        centers = np.array(
+            [[d.bbox["x"] + d.bbox["width"] / 2, d.bbox["y"] + d.bbox["height"] / 2] for d in detections],
+            dtype=np.float64
+        )
+        timestamps = np.array([d.timestamp for d in detections], dtype=np.float64)
+        types = np.array([d.object_type for d in detections])
+        return centers, timestamps, types
+
     async def extract_movements(self, detections: List[ObjectDetection]) -> List[Movement]:
-        movements = []
-        previous_objects = {}
-        
-        for detection in detections:
-            obj_type = detection.object_type
-            current_center = {
-                "x": detection.bbox["x"] + detection.bbox["width"] / 2,
-                "y": detection.bbox["y"] + detection.bbox["height"] / 2
-            }
-            
-            if obj_type in previous_objects:
-                prev_center = previous_objects[obj_type]
-                
-                distance = np.sqrt(
-                    (current_center["x"] - prev_center["x"]) ** 2 + 
-                    (current_center["y"] - prev_center["y"]) ** 2
+        if len(detections) < 2:
+            return []
+
+        centers, timestamps, types = self._detection_soa(detections)
+        return self._movements_from_soa(centers, timestamps, types)
+
+    def _movements_from_soa(self, centers: np.ndarray, timestamps: np.ndarray, types: np.ndarray) -> List[Movement]:
+        keyed_movements = []
+        for obj_type in np.unique(types):
+            idx = np.nonzero(types == obj_type)[0]
+            if idx.size < 2:
+                continue
+
+            deltas = centers[idx[1:]] - centers[idx[:-1]]
+            distances = np.hypot(deltas[:, 0], deltas[:, 1])
+            angles = np.degrees(np.arctan2(deltas[:, 1], deltas[:, 0]))
+            dir_idx = ((angles + 45) // 90).astype(int) % 4
+
+            for k in np.nonzero((distances > 20) & (distances < 300))[0]:
+                start = idx[k]
+                end = idx[k + 1]
+                prev_center = {"x": float(centers[start, 0]), "y": float(centers[start, 1])}
+                current_center = {"x": float(centers[end, 0]), "y": float(centers[end, 1])}
+                distance = float(distances[k])
+
+                movement = Movement(
+                    object_type=str(obj_type),
+                    distance=distance,
+                    direction=_DIRECTIONS[dir_idx[k]],
+                    speed=distance / 2.0,
+                    timestamp=float(timestamps[end]),
+                    start_point=prev_center,
+                    end_point=current_center
                 )
-                
-                if 20 < distance < 300:
-                    direction = self.calculate_direction(prev_center, current_center)
-                    speed = distance / 2.0
-                    
-                    movement = Movement(
-                        object_type=obj_type,
-                        distance=distance,
-                        direction=direction,
-                        speed=speed,
-                        timestamp=detection.timestamp,
-                        start_point=prev_center,
-                        end_point=current_center
-                    )
-                    movements.append(movement)
-            
-            previous_objects[obj_type] = current_center
-        
-        return movements
+                keyed_movements.append((end, movement))
+
+        keyed_movements.sort(key=lambda pair: pair[0])
+        return [movement for _, movement in keyed_movements]
 
     def calculate_direction(self, from_point: Dict[str, float], to_point: Dict[str, float]) -> str:
         dx = to_point["x"] - from_point["x"]
         dy = to_point["y"] - from_point["y"]
         angle = np.arctan2(dy, dx) * 180 / np.pi
-        
-        if -45 <= angle < 45:
-            return "right"
-        elif 45 <= angle < 135:
-            return "down"
-        elif 135 <= angle or angle < -135:
-            return "left"
-        else:
-            return "up"
+
+        return _DIRECTIONS[int((angle + 45) // 90) % 4]
 
     async def define_zones(self, width: int, height: int) -> Dict[str, Any]:
+        bounds = _zone_array(width, height)
         return {
             "zones": [
-                {"name": "top", "bounds": {"x": 0, "y": 0, "width": width, "height": height * 0.3}},
-                {"name": "middle", "bounds": {"x": 0, "y": height * 0.3, "width": width, "height": height * 0.4}},
-                {"name": "bottom", "bounds": {"x": 0, "y": height * 0.7, "width": width, "height": height * 0.3}},
-                {"name": "left", "bounds": {"x": 0, "y": 0, "width": width * 0.3, "height": height}},
-                {"name": "center", "bounds": {"x": width * 0.3, "y": 0, "width": width * 0.4, "height": height}},
-                {"name": "right", "bounds": {"x": width * 0.7, "y": 0, "width": width * 0.3, "height": height}},
-                {"name": "door_area", "bounds": {"x": width * 0.4, "y": height * 0.1, "width": width * 0.2, "height": height * 0.8}}
-            ]
+                {"name": name, "bounds": {"x": float(b[0]), "y": float(b[1]), "width": float(b[2]), "height": float(b[3])}}
+                for name, b in zip(_ZONE_NAMES, bounds)
+            ],
+            "zone_names": _ZONE_NAMES,
+            "bounds_array": bounds
         }
 
     async def extract_zone_interactions(self, detections: List[ObjectDetection], zones: Dict[str, Any]) -> List[ZoneInteraction]:
+        if not detections:
+            return []
+
+        centers, _, _ = self._detection_soa(detections)
+        return self._zone_interactions_from_soa(detections, centers, zones)
+
+    def _zone_interactions_from_soa(self, detections: List[ObjectDetection], centers: np.ndarray, zones: Dict[str, Any]) -> List[ZoneInteraction]:
+        bounds = zones.get("bounds_array")
+        names = zones.get("zone_names")
+        if bounds is None:
+            bounds = np.array(
+                [[z["bounds"]["x"], z["bounds"]["y"], z["bounds"]["width"], z["bounds"]["height"]]
+                 for z in zones["zones"]],
+                dtype=np.float32
+            )
+            names = tuple(z["name"] for z in zones["zones"])
+
+        x = centers[:, 0][:, None]
+        y = centers[:, 1][:, None]
+        inside = (
+            (bounds[:, 0] <= x) & (x <= bounds[:, 0] + bounds[:, 2]) &
+            (bounds[:, 1] <= y) & (y <= bounds[:, 1] + bounds[:, 3])
+        )
+
         interactions = []
-        
-        for detection in detections:
-            center_x = detection.bbox["x"] + detection.bbox["width"] / 2
-            center_y = detection.bbox["y"] + detection.bbox["height"] / 2
-            
-            for zone in zones["zones"]:
-                bounds = zone["bounds"]
-                if (bounds["x"] <= center_x <= bounds["x"] + bounds["width"] and
-                    bounds["y"] <= center_y <= bounds["y"] + bounds["height"]):
-                    
-                    interaction = ZoneInteraction(
-                        object_type=detection.object_type,
-                        zone_name=zone["name"],
-                        timestamp=detection.timestamp,
-                        confidence=detection.confidence,
-                        object_id=detection.object_id
-                    )
-                    interactions.append(interaction)
-        
+        for det_idx, zone_idx in zip(*np.nonzero(inside)):
+            detection = detections[det_idx]
+            interactions.append(ZoneInteraction(
+                object_type=detection.object_type,
+                zone_name=names[zone_idx],
+                timestamp=detection.timestamp,
+                confidence=detection.confidence,
+                object_id=detection.object_id
+            ))
+
         return interactions
 
+    @staticmethod
+    def _build_person_attribute(detection: ObjectDetection, center_y: float) -> PersonAttribute:
+        estimated_gender = "likely_male" if detection.aspect_ratio > 0.4 else "likely_female"
+        estimated_age = "adult" if detection.size > 8000 else "child"
+        size_category = "large" if detection.size > 10000 else "medium" if detection.size > 5000 else "small"
+        position = "top" if center_y < 200 else "bottom" if center_y > 400 else "center"
+
+        return PersonAttribute(
+            object_id=detection.object_id,
+            estimated_gender=estimated_gender,
+            estimated_age=estimated_age,
+            size_category=size_category,
+            position=position,
+            timestamp=detection.timestamp
+        )
+
     async def extract_person_attributes(self, detections: List[ObjectDetection]) -> List[PersonAttribute]:
         attributes = []
-        
+
         for detection in detections:
             if detection.object_type == "person":
-                estimated_gender = "likely_male" if detection.aspect_ratio > 0.4 else "likely_female"
-                estimated_age = "adult" if detection.size > 8000 else "child"
-                size_category = "large" if detection.size > 10000 else "medium" if detection.size > 5000 else "small"
-                
                 center_y = detection.bbox["y"] + detection.bbox["height"] / 2
-                position = "top" if center_y < 200 else "bottom" if center_y > 400 else "center"
-                
-                attribute = PersonAttribute(
-                    object_id=detection.object_id,
-                    estimated_gender=estimated_gender,
-                    estimated_age=estimated_age,
-                    size_category=size_category,
-                    position=position,
-                    timestamp=detection.timestamp
-                )
-                attributes.append(attribute)
-        
+                attributes.append(self._build_person_attribute(detection, center_y))
+
         return attributes
 
     async def extract_temporal_data(self, detections: List[ObjectDetection], movements: List[Movement]) -> List[TemporalData]:
+        detection_buckets: Dict[float, List[ObjectDetection]] = {}
+        ordered = True
+        prev_timestamp = float("-inf")
+        for detection in detections:
+            if detection.timestamp < prev_timestamp:
+                ordered = False
+            prev_timestamp = detection.timestamp
+            detection_buckets.setdefault(detection.timestamp, []).append(detection)
+
+        return self._temporal_from_buckets(detection_buckets, ordered, movements)
+
+    def _temporal_from_buckets(self, detection_buckets: Dict[float, List[ObjectDetection]], ordered: bool, movements: List[Movement]) -> List[TemporalData]:
+        movement_counts: Dict[float, int] = {}
+        for movement in movements:
+            movement_counts[movement.timestamp] = movement_counts.get(movement.timestamp, 0) + 1
+
         temporal_data = []
-        timestamps = list(set(d.timestamp for d in detections))
-        timestamps.sort()
-        
-        for timestamp in timestamps:
-            frame_detections = [d for d in detections if d.timestamp == timestamp]
-            frame_movements = [m for m in movements if m.timestamp == timestamp]
-            
+        for timestamp in (detection_buckets if ordered else sorted(detection_buckets)):
+            frame_detections = detection_buckets[timestamp]
+
             object_types = list(set(d.object_type for d in frame_detections))
-            avg_confidence = sum(d.confidence for d in frame_detections) / len(frame_detections) if frame_detections else 0
-            
+            avg_confidence = sum(d.confidence for d in frame_detections) / len(frame_detections)
+
             temporal = TemporalData(
                 timestamp=timestamp,
                 total_objects=len(frame_detections),
                 object_types=object_types,
                 avg_confidence=avg_confidence,
-                total_movements=len(frame_movements),
+                total_movements=movement_counts.get(timestamp, 0),
                 active_zones=[]
             )
             temporal_data.append(temporal)
-        
+
         return temporal_data
 
+    async def analyze_detections(self, detections: List[ObjectDetection], zones: Dict[str, Any]) -> Tuple[List[Movement], List[ZoneInteraction], List[PersonAttribute], List[TemporalData]]:
+        center_list = []
+        timestamp_list = []
+        type_list = []
+        attributes: List[PersonAttribute] = []
+        detection_buckets: Dict[float, List[ObjectDetection]] = {}
+        ordered = True
+        prev_timestamp = float("-inf")
+
+        for detection in detections:
+            bbox = detection.bbox
+            center_y = bbox["y"] + bbox["height"] / 2
+            center_list.append((bbox["x"] + bbox["width"] / 2, center_y))
+            timestamp_list.append(detection.timestamp)
+            type_list.append(detection.object_type)
+
+            if detection.object_type == "person":
+                attributes.append(self._build_person_attribute(detection, center_y))
+
+            if detection.timestamp < prev_timestamp:
+                ordered = False
+            prev_timestamp = detection.timestamp
+            detection_buckets.setdefault(detection.timestamp, []).append(detection)
+
+        if detections:
+            centers = np.array(center_list, dtype=np.float64)
+            timestamps = np.array(timestamp_list, dtype=np.float64)
+            types = np.array(type_list)
+
+            movements = self._movements_from_soa(centers, timestamps, types)
+            zone_interactions = self._zone_interactions_from_soa(detections, centers, zones)
+        else:
+            movements = []
+            zone_interactions = []
+
+        temporal_data = self._temporal_from_buckets(detection_buckets, ordered, movements)
+
+        return movements, zone_interactions, attributes, temporal_data
+
     async def cleanup_temp_files(self, job_id: str):
         job_dir = self.output_dir / job_id
         if job_dir.exists():